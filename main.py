@@ -1,31 +1,54 @@
-import pandas as pd
+import asyncio
+import orjson
+import pyarrow as pa
+import pyarrow.parquet as pq
 import uvicorn
-from fastapi import FastAPI
-from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+from os import stat
 from os.path import exists
-from autots import AutoTS
 
 app = FastAPI()
 
-def train():
-  model = AutoTS(forecast_length=12,
-               frequency='infer',
-               model_list="superfast",
-               ensemble='simple')
-
-  if exists('data.csv'):
-    df = pd.read_csv('data.csv')
-    df['ds'] = pd.to_datetime(df['ds'])
-    model = model.fit(df, date_col='ds', value_col='y', id_col=None)
-    model.export_template('model.csv', models='best',
-                        n=15, max_per_model_class=3)
-    prediction = model.predict()
-    preds = prediction.forecast
-
-    preds = preds.reset_index()
-    preds = preds.rename(columns={"index": "ds"})
-    preds.to_csv('forecast.csv', index=False)
+# serialized responses are keyed by file mtime so out-of-band
+# pull_data.py/train.py runs get picked up on the next request
+json_cache = {}
+# 503 detail for each served file while it does not exist yet
+missing = {'forecast.parquet': "forecast.parquet not found, call /train",
+           'data.parquet': "data.parquet not found, run pull_data.py"}
+train_lock = None
+
+def fit():
+  # imported here so serving /data and /pred never loads the AutoTS stack
+  from train import train
+  train()
+
+def to_json(path):
+  # serialize straight from the Arrow buffers, no pandas round-trip;
+  # ds goes out as epoch nanoseconds, same as the old jsonable_encoder output.
+  # files written as Parquet format 2.4 hold us, so normalize the unit first
+  tbl = pq.read_table(path, columns=['ds', 'y'], memory_map=True)
+  ds = tbl.column('ds').cast(pa.timestamp('ns')).cast(pa.int64())
+  return orjson.dumps({'ds': ds.to_numpy(),
+                       'y': tbl.column('y').to_numpy()},
+                      option=orjson.OPT_SERIALIZE_NUMPY)
+
+def cached_json(path):
+  try:
+    mtime = stat(path).st_mtime_ns
+    hit = json_cache.get(path)
+    if hit is None or hit[0] != mtime:
+      hit = json_cache[path] = (mtime, to_json(path))
+  except FileNotFoundError:
+    raise HTTPException(status_code=503, detail=missing[path])
+  return hit[1]
+
+@app.on_event("startup")
+async def startup():
+  global train_lock
+  # created here so the lock binds to the server's event loop
+  train_lock = asyncio.Lock()
 
 @app.get("/")
 async def root():
@@ -34,26 +57,23 @@ async def root():
 
 @app.get("/pred")
 async def predictions():
-  df = pd.read_csv('forecast.csv')
-  df['ds'] = pd.to_datetime(df['ds'])
-  ds = jsonable_encoder(df['ds'].values.tolist())
-  y = jsonable_encoder(df['y'].values.tolist())
-  out = {'ds': ds, 'y': y}
-  return JSONResponse(content=jsonable_encoder(out))
+  body = cached_json('forecast.parquet')
+  return Response(content=body, media_type='application/json')
 
 
 @app.get("/data")
 async def get_data():
-  df = pd.read_csv('data.csv')
-  df['ds'] = pd.to_datetime(df['ds'])
-  ds = jsonable_encoder(df['ds'].values.tolist())
-  y = jsonable_encoder(df['y'].values.tolist())
-  out = {'ds': ds, 'y': y}
-  return JSONResponse(content=jsonable_encoder(out))
+  body = cached_json('data.parquet')
+  return Response(content=body, media_type='application/json')
 
 @app.get("/train")
-async def root():
-  train()
+async def retrain():
+  # train() has nothing to fit without data, so say so instead of "Trained!"
+  if not exists('data.parquet'):
+    raise HTTPException(status_code=503, detail=missing['data.parquet'])
+  # fit off the event loop; concurrent calls wait for the running fit
+  async with train_lock:
+    await run_in_threadpool(fit)
   return "Trained!"
 
 
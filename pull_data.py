@@ -1,14 +1,18 @@
 from fredapi import Fred
-import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 import os
 
 fred_key = os.environ['FRED_KEY']
 fred = Fred(api_key=fred_key)
 
 data = fred.get_series('SDXRSA')
-df = pd.DataFrame(data=data, columns=['y'])
-df['unique_id'] = 0
-df = df.reset_index()
-df = df.rename(columns={"index": "ds"})
+t = pa.table({'ds': pa.array(data.index.values, type=pa.timestamp('ns')),
+              'y': pa.array(data.values, type=pa.float64()),
+              'unique_id': pa.array(np.zeros(len(data), dtype=np.int32))})
 
-df.to_csv('data.csv', index=False)
+# format 2.6 keeps ns timestamps; older pyarrow defaults to 2.4, which stores us.
+# written aside and swapped in so a running server never reads a partial file
+pq.write_table(t, 'data.parquet.tmp', compression='zstd', version='2.6')
+os.replace('data.parquet.tmp', 'data.parquet')
@@ -1,20 +1,72 @@
+import logging
+import os
 import pandas as pd
 from autots import AutoTS
+from autots.models.model_list import model_lists
+from joblib import Parallel, delayed
 from os.path import exists
 
-model = AutoTS(forecast_length=12,
-               frequency='infer',
-               model_list="superfast",
-               ensemble='simple')
-
-if exists('data.csv'):
-  df = pd.read_csv('data.csv')
-  model = model.fit(df, date_col='ds', value_col='y')
-  model.export_template('model.csv', models='best',
-                      n=15, max_per_model_class=3)
-  prediction = model.predict()
-  preds = prediction.forecast
-
-  preds = preds.reset_index()
-  preds = preds.rename(columns={"index": "ds"})
-  preds.to_csv('forecast.csv', index=False)
\ No newline at end of file
+logger = logging.getLogger(__name__)
+
+# shared by the per-class search shards and the final ensemble fit
+autots_args = {'forecast_length': 12, 'frequency': 'infer'}
+
+def search_one(model_name, df):
+  # one model class per worker; the winners are cross-validated together in
+  # train()
+  shard = AutoTS(model_list=[model_name],
+                 ensemble=None,
+                 n_jobs=1,
+                 **autots_args)
+  try:
+    shard = shard.fit(df, date_col='ds', value_col='y')
+  except Exception as e:
+    # AutoTS raises once every model in the class has failed; hand the error
+    # back so train() can report it and carry on with the other classes
+    return None, e
+  return shard.export_template(None, models='best',
+                               n=15, max_per_model_class=3), None
+
+def train():
+  # models_to_validate=0.99 sends every pooled template through cross
+  # validation, not just the default top 15%
+  model = AutoTS(model_list="superfast",
+                 ensemble='simple',
+                 max_generations=0,
+                 models_to_validate=0.99,
+                 **autots_args)
+
+  if exists('data.parquet'):
+    df = pd.read_parquet('data.parquet', engine='pyarrow')
+    results = Parallel(n_jobs=-1, backend='loky')(
+      delayed(search_one)(m, df) for m in model_lists['superfast'])
+    templates = []
+    errors = []
+    for m, (template, error) in zip(model_lists['superfast'], results):
+      if error is None:
+        templates.append(template)
+      else:
+        logger.warning("%s search failed: %r", m, error)
+        errors.append(error)
+    if not templates:
+      raise RuntimeError("all model classes failed to fit") from errors[0]
+    model.import_template(pd.concat(templates), method='only')
+    model = model.fit(df, date_col='ds', value_col='y')
+    model.export_template('model.csv', models='best',
+                          n=15, max_per_model_class=3)
+    prediction = model.predict()
+    preds = prediction.forecast
+
+    preds = preds.reset_index()
+    preds = preds.rename(columns={"index": "ds"})
+    # format 2.6 keeps ns timestamps; older pyarrow defaults to 2.4, which
+    # stores us. written aside and swapped in so a concurrent /pred never
+    # reads a half-written file
+    preds.to_parquet('forecast.parquet.tmp', engine='pyarrow', index=False,
+                     version='2.6')
+    os.replace('forecast.parquet.tmp', 'forecast.parquet')
+  return model
+
+
+if __name__ == '__main__':
+  train()